@@ -0,0 +1,21 @@
+
+from typing import Dict, Optional
+
+from game_state_pb2 import GameStates
+import test_next_moves_cc
+
+
+# Generates the states reachable in one move from the serialized game with the
+# C++ library. If cache is given, the raw responses are kept in it keyed by
+# state_bytes, so states that come up again are not regenerated. Raw bytes take
+# a fraction of the memory of parsed GameStates.
+def gen_next_states_cc(state_bytes: bytes, cache: Optional[Dict[bytes, bytes]] = None) -> GameStates:
+  res = None if cache is None else cache.get(state_bytes)
+  if res is None:
+    res = test_next_moves_cc.gen_next_moves(state_bytes)
+    if cache is not None:
+      cache[state_bytes] = res
+
+  gs = GameStates()
+  gs.ParseFromString(res)
+  return gs
@@ -1,112 +1,257 @@
 
 from __future__ import annotations
-import copy
-from typing import Iterable, List, Set, Tuple, Union
+from typing import Iterable, List, Optional, Set, Tuple, Union
 
-from coord import Coord, PawnToCoord, CoordToPawn, coord_neighbors
+from coord import Coord, CoordToPawn, NEIGHBOR_DELTAS, PawnT
 from game_state_pb2 import GameState
+from onoro_kernels import (
+    add_neighbor, any_n_in_row, cell_neighbors, components, count_neighbors,
+    n_in_row_through, remove_neighbor, splits_neighbors)
 
 Pawn = GameState.Pawn
 
+# Shifts of the board's minimum corner that are tried when finding the move
+# made between two game states.
+_DIFF_OFFSETS = ((0, 0),) + NEIGHBOR_DELTAS
+
+# (x, y, black) of a pawn, as stored in the sets built by Onoro._PawnSet.
+PawnKey = Tuple[int, int, bool]
+
+
+def _translation_key(coords: List[Coord], blacks: List[bool],
+                     minx: int, miny: int, maxx: int) -> Tuple[int, int, int]:
+  width = maxx - minx + 1
+  black_bb = 0
+  white_bb = 0
+  for (x, y), black in zip(coords, blacks):
+    if black:
+      black_bb |= 1 << ((x - minx) + (y - miny) * width)
+    else:
+      white_bb |= 1 << ((x - minx) + (y - miny) * width)
+  return (width, black_bb, white_bb)
+
 
 class Onoro:
 
+  __slots__ = (
+      'num_pawns',
+      'black_turn',
+      '_pawns',
+      '_coords',
+      '_blacks',
+      '_bounds',
+      '_key',
+      '_ox',
+      '_oy',
+      '_stride',
+      'black_bb',
+      'white_bb',
+      '_nbr_counts',
+      '_black_won',
+      '_white_won',
+    )
+
   _EMPTY = 0
   _BLACK = 1
   _WHITE = 2
 
   _N_IN_ROW_TO_WIN = 4
 
+  # Number of empty columns/rows kept on each side of the pawns when laying
+  # out the bitboards, so most moves can be applied without a re-layout.
+  _BB_PAD = 4
+
   SHOW_NEXT_MOVES = False
 
-  def __init__(self, num_pawns: int, pawns: List[GameState.Pawn], black_turn: bool):
+  def __init__(self, num_pawns: int, pawns: Iterable[Union[Pawn, PawnT]], black_turn: bool):
     self.num_pawns = num_pawns
     self.black_turn = black_turn
-    self.pawns = list(pawns)
+    pawns = list(pawns)
+    self._SetCoords([(pawn.x, pawn.y) for pawn in pawns], [pawn.black for pawn in pawns])
+
+  def _SetCoords(self, coords: List[Coord], blacks: List[bool]) -> None:
+    self._pawns = None
+    self._key = None
+    self._coords = coords
+    self._blacks = blacks
+    self._bounds = None
+    self._BuildBitboards()
+
+  @property
+  def pawns(self) -> List[PawnT]:
+    """The pawns, built from _coords/_blacks on first use after each change to
+    the board."""
+    if self._pawns is None:
+      self._pawns = [PawnT(x, y, black) for (x, y), black in zip(self._coords, self._blacks)]
+    return self._pawns
+
+  def _Bounds(self) -> Tuple[int, int, int, int]:
+    """Returns (minx, miny, maxx, maxy) of the pawns, cached until the next
+    move that could shrink them."""
+    if self._bounds is None:
+      if not self._coords:
+        self._bounds = (0, 0, 0, 0)
+      else:
+        minx, miny = maxx, maxy = self._coords[0]
+        for x, y in self._coords:
+          if x < minx:
+            minx = x
+          elif x > maxx:
+            maxx = x
+          if y < miny:
+            miny = y
+          elif y > maxy:
+            maxy = y
+        self._bounds = (minx, miny, maxx, maxy)
+    return self._bounds
+
+  def _PawnSet(self) -> Set[PawnKey]:
+    return {(x, y, black) for (x, y), black in zip(self._coords, self._blacks)}
+
+  def _BuildBitboards(self) -> None:
+    """Lays out black_bb/white_bb, with bit (x - ox) + (y - oy) * stride set
+    for each pawn at (x, y).
+
+    Pawns are always kept off the first/last column and the first row, so
+    shifting a bitboard by one cell never wraps a pawn onto another row.
+    """
+    minx, miny, maxx, _ = self._Bounds()
+
+    self._ox = minx - self._BB_PAD
+    self._oy = miny - self._BB_PAD
+    self._stride = maxx - minx + 2 * self._BB_PAD + 1
+
+    self.black_bb = 0
+    self.white_bb = 0
+    for (x, y), black in zip(self._coords, self._blacks):
+      if black:
+        self.black_bb |= self._Bit(x, y)
+      else:
+        self.white_bb |= self._Bit(x, y)
+    self._nbr_counts = count_neighbors(self.black_bb | self.white_bb, self._stride)
+    self._black_won = any_n_in_row(self.black_bb, self._stride, self._N_IN_ROW_TO_WIN)
+    self._white_won = any_n_in_row(self.white_bb, self._stride, self._N_IN_ROW_TO_WIN)
+
+  def _Bit(self, x: int, y: int) -> int:
+    return 1 << ((x - self._ox) + (y - self._oy) * self._stride)
+
+  def _InFrame(self, x: int, y: int) -> bool:
+    return 1 <= x - self._ox < self._stride - 1 and y - self._oy >= 1
+
+  def _AddToBitboards(self, pawn: PawnT) -> None:
+    if not self._InFrame(pawn.x, pawn.y):
+      self._BuildBitboards()
+      return
+
+    bit = self._Bit(pawn.x, pawn.y)
+    # Only rows through the new pawn can have been completed.
+    if pawn.black:
+      self.black_bb |= bit
+      self._black_won = self._black_won or \
+          n_in_row_through(self.black_bb, bit, self._stride, self._N_IN_ROW_TO_WIN)
+    else:
+      self.white_bb |= bit
+      self._white_won = self._white_won or \
+          n_in_row_through(self.white_bb, bit, self._stride, self._N_IN_ROW_TO_WIN)
+    self._nbr_counts = add_neighbor(self._nbr_counts, cell_neighbors(bit, self._stride))
+
+  def _RemoveFromBitboards(self, pawn: PawnT) -> None:
+    bit = self._Bit(pawn.x, pawn.y)
+    # Removing a pawn can only break rows, so only an existing win needs to be
+    # rechecked.
+    if pawn.black:
+      self.black_bb &= ~bit
+      if self._black_won:
+        self._black_won = any_n_in_row(self.black_bb, self._stride, self._N_IN_ROW_TO_WIN)
+    else:
+      self.white_bb &= ~bit
+      if self._white_won:
+        self._white_won = any_n_in_row(self.white_bb, self._stride, self._N_IN_ROW_TO_WIN)
+    self._nbr_counts = remove_neighbor(self._nbr_counts, cell_neighbors(bit, self._stride))
 
   def serialize(self) -> GameState:
-    black_pawns = [piece for piece in self.pawns if piece.black]
-    white_pawns = [piece for piece in self.pawns if not piece.black]
+    n_black = sum(self._blacks)
+    n_white = len(self._blacks) - n_black
 
-    if len(black_pawns) < len(white_pawns):
+    if n_black < n_white:
       raise RuntimeError('Fewer black pawns than white (%d vs %d)' %
-                         (len(black_pawns), len(white_pawns)))
-    if len(black_pawns) > len(white_pawns) + 1:
+                         (n_black, n_white))
+    if n_black > n_white + 1:
       raise RuntimeError('Too many black pawns (%d vs %d)' %
-                         (len(black_pawns), len(white_pawns)))
-    if len(self.pawns) > self.num_pawns:
+                         (n_black, n_white))
+    if len(self._coords) > self.num_pawns:
       raise RuntimeError('Too many pawns (have %d, expect %d)' %
-                         (len(self.pawns), self.num_pawns))
+                         (len(self._coords), self.num_pawns))
 
     gs = GameState(
-        pawns=self.pawns,
+        pawns=[Pawn(x=x, y=y, black=black) for (x, y), black in zip(self._coords, self._blacks)],
         black_turn=self.black_turn,
-        turn_num=len(self.pawns) - 1,
+        turn_num=len(self._coords) - 1,
         finished=self.HasWinner()
       )
     return gs
 
-  # Returns the move made from diff to self, in terms of pawns on self's board.
-  def game_diff(self, diff: Onoro) -> Union[Pawn, Tuple[Pawn, Pawn]]:
-    minx = min((pawn.x for pawn in self.pawns))
-    miny = min((pawn.y for pawn in self.pawns))
-    dminx = min((pawn.x for pawn in diff.pawns))
-    dminy = min((pawn.y for pawn in diff.pawns))
-
-    for offset in (
-        Coord(0, 0),
-        Coord(1, 0),
-        Coord(1, 1),
-        Coord(0, 1),
-        Coord(-1, 0),
-        Coord(-1, -1),
-        Coord(0, -1)):
-      mx = dminx + offset.x
-      my = dminy + offset.y
-
-      n_new = 0
-      new_pawn = None
-      for pawn in self.pawns:
-        p = Pawn(
-            x=pawn.x - minx + mx,
-            y=pawn.y - miny + my,
-            black=pawn.black)
-        if p not in diff.pawns:
-          n_new += 1
-          new_pawn = p
-
-      n_old = 0
-      old_pawn = None
-      for pawn in diff.pawns:
-        p = Pawn(
-            x=pawn.x - mx + minx,
-            y=pawn.y - my + miny,
-            black=pawn.black)
-        if p not in self.pawns:
-          n_old += 1
-          old_pawn = p
-
-      if n_new == 1 and n_old == 1:
-        return (old_pawn, new_pawn)
-      if n_new == 1 and n_old == 0:
-        return new_pawn
-    raise RuntimeError('game state\n' + str(self) + '\ncould not have come from\n' + str(diff))
+  def _FindDiff(self, diff: Onoro) -> Optional[Tuple[int, int, Optional[PawnKey], PawnKey]]:
+    """Finds the translation of diff's board against self's under which exactly
+    one of self's pawns is new, and at most one of diff's is gone.
+
+    Returns (mx, my, old, new), where (mx, my) is where self's min corner lands
+    on diff's board and old/new are the removed/added pawns in self's
+    coordinates, or None if self can't have come from diff in one move.
+    """
+    minx, miny, _, _ = self._Bounds()
+    dminx, dminy, _, _ = diff._Bounds()
+    self_pawns = self._PawnSet()
+    diff_pawns = diff._PawnSet()
+
+    for dx, dy in _DIFF_OFFSETS:
+      mx = dminx + dx
+      my = dminy + dy
+
+      new_pawns = [(x, y, black) for x, y, black in self_pawns
+                   if (x - minx + mx, y - miny + my, black) not in diff_pawns]
+      if len(new_pawns) != 1:
+        continue
+
+      old_pawns = []
+      for x, y, black in diff_pawns:
+        p = (x - mx + minx, y - my + miny, black)
+        if p not in self_pawns:
+          old_pawns.append(p)
+      if len(old_pawns) <= 1:
+        return (mx, my, old_pawns[0] if old_pawns else None, new_pawns[0])
+    return None
+
+  # Returns the move made from diff to self. The old pawn is given in self's
+  # coordinates, and the new pawn in diff's.
+  def game_diff(self, diff: Onoro) -> Union[PawnT, Tuple[PawnT, PawnT]]:
+    found = self._FindDiff(diff)
+    if found is None:
+      raise RuntimeError('game state\n' + str(self) + '\ncould not have come from\n' + str(diff))
+
+    mx, my, old_pawn, (x, y, black) = found
+    minx, miny, _, _ = self._Bounds()
+    new_pawn = PawnT(x - minx + mx, y - miny + my, black)
+    if old_pawn is None:
+      return new_pawn
+    return (PawnT._make(old_pawn), new_pawn)
 
   def rotate_60(self) -> None:
-    self.pawns = [Pawn(x=pawn.x - pawn.y, y=pawn.x, black=pawn.black) for pawn in self.pawns]
+    self._SetCoords([(x - y, x) for x, y in self._coords], self._blacks)
 
   def refl(self) -> None:
-    self.pawns = [Pawn(x=pawn.x - pawn.y, y=-pawn.y, black=pawn.black) for pawn in self.pawns]
+    self._SetCoords([(x - y, -y) for x, y in self._coords], self._blacks)
 
   def invert_colors(self) -> None:
-    self.pawns = [Pawn(x=pawn.x, y=pawn.y, black=not pawn.black) for pawn in self.pawns]
+    self._pawns = None
+    self._key = None
+    self._blacks = [not black for black in self._blacks]
     self.black_turn = not self.black_turn
+    self.black_bb, self.white_bb = self.white_bb, self.black_bb
+    self._black_won, self._white_won = self._white_won, self._black_won
 
   def __repr__(self, check_errors: bool = True, diff: Onoro = None) -> str:
-    minx = min((pawn.x for pawn in self.pawns))
-    maxx = max((pawn.x for pawn in self.pawns))
-    miny = min((pawn.y for pawn in self.pawns))
-    maxy = max((pawn.y for pawn in self.pawns))
+    minx, miny, maxx, maxy = self._Bounds()
 
     midx = (minx + maxx) // 2
     midy = (miny + maxy) // 2
@@ -114,91 +259,43 @@ class Onoro:
     offx = self.num_pawns // 2 - 1 - midx
     offy = self.num_pawns // 2 - 1 - midy
 
+    old_pawn = new_pawn = None
     if diff is not None:
-      dminx = min((pawn.x for pawn in diff.pawns))
-      dminy = min((pawn.y for pawn in diff.pawns))
-
-      for offset in (
-          Coord(0, 0),
-          Coord(1, 0),
-          Coord(1, 1),
-          Coord(0, 1),
-          Coord(-1, 0),
-          Coord(-1, -1),
-          Coord(0, -1),
-          None):
-        assert(offset is not None)
-        mx = dminx + offset.x
-        my = dminy + offset.y
-
-        n_new = 0
-        for pawn in self.pawns:
-          if Pawn(
-              x=pawn.x - minx + mx,
-              y=pawn.y - miny + my,
-              black=pawn.black) not in diff.pawns:
-            n_new += 1
-
-        n_old = 0
-        for pawn in diff.pawns:
-          if Pawn(
-              x=pawn.x - mx + minx,
-              y=pawn.y - my + miny,
-              black=pawn.black) not in self.pawns:
-            n_old += 1
-
-        if n_new == 1 and n_old <= 1:
-          dminx = mx
-          dminy = my
-          break
+      found = self._FindDiff(diff)
+      assert(found is not None)
+      _, _, old_pawn, new_pawn = found
 
     board = ['.'] * (self.num_pawns * self.num_pawns)
-    for pawn in self.pawns:
-      x = pawn.x + offx
-      y = pawn.y + offy
-
-      if diff is not None and Pawn(
-          x=pawn.x - minx + dminx,
-          y=pawn.y - miny + dminy,
-          black=pawn.black) not in diff.pawns:
+    for (px, py), black in zip(self._coords, self._blacks):
+      x = px + offx
+      y = py + offy
+
+      if (px, py, black) == new_pawn:
         b = '\033[0;32mB\033[0;39m'
         w = '\033[0;32mW\033[0;39m'
       else:
         b = 'B'
         w = 'W'
 
-      board[x + y * self.num_pawns] = b if pawn.black else w
+      board[x + y * self.num_pawns] = b if black else w
+
+    if old_pawn is not None:
+      x, y, _ = old_pawn
+      # The old spot can only still be occupied by a pawn of the other color.
+      if (x, y) in self._coords:
+        board[(x + offx) + (y + offy) * self.num_pawns] = '\033[0;31mX\033[0;39m'
+      else:
+        board[(x + offx) + (y + offy) * self.num_pawns] = '\033[0;31m0\033[0;39m'
 
-    if diff is not None:
-      for pawn in diff.pawns:
-        x = pawn.x - dminx + minx
-        y = pawn.y - dminy + miny
-        if Pawn(x=x, y=y, black=pawn.black) not in self.pawns:
-          if Pawn(x=x, y=y, black=not pawn.black) in self.pawns:
-            board[(x + offx) + (y + offy) * self.num_pawns] = '\033[0;31mX\033[0;39m'
-          else:
-            board[(x + offx) + (y + offy) * self.num_pawns] = '\033[0;31m0\033[0;39m'
-
-    res = ''
     if self.HasWinner(check_errors=check_errors):
-      res += 'WINNER: %s\n' % ('white' if self.black_turn else 'black')
+      header = 'WINNER: %s\n' % ('white' if self.black_turn else 'black')
     else:
-      res += 'turn: %s\n' % ('black' if self.black_turn else 'white')
-
-      self_off_x = min((pawn.x for pawn in self.pawns))
-      self_off_y = min((pawn.y for pawn in self.pawns))
-      h = (
-        tuple((pawn.x - self_off_x, pawn.y - self_off_y, pawn.black) for pawn in self.pawns),
-        self.black_turn,
-        self.num_pawns,
-      )
+      header = 'turn: %s\n' % ('black' if self.black_turn else 'white')
 
-    for line in range(self.num_pawns):
-      r = self.num_pawns - line - 1
-      res += ''.join([' '] * line) + ' '.join(board[(self.num_pawns * r):(self.num_pawns * (r + 1))])
-      if line < self.num_pawns - 1:
-        res += '\n'
-    return res
+    n = self.num_pawns
+    return header + '\n'.join(
+        ' ' * line + ' '.join(board[(n * r):(n * (r + 1))])
+        for line, r in enumerate(range(n - 1, -1, -1)))
 
   def __eq__(self, other) -> bool:
     if not isinstance(other, Onoro):
@@ -208,162 +305,215 @@ class Onoro:
       return False
     if self.black_turn != other.black_turn:
       return False
-    if len(self.pawns) != len(other.pawns):
+    if len(self._coords) != len(other._coords):
       return False
 
-    self_off_x = min((pawn.x for pawn in self.pawns))
-    self_off_y = min((pawn.y for pawn in self.pawns))
-    other_off_x = min((pawn.x for pawn in other.pawns))
-    other_off_y = min((pawn.y for pawn in other.pawns))
-
-    self_off = Coord(self_off_x, self_off_y)
-    other_off = Coord(other_off_x, other_off_y)
-
-    for pawn in self.pawns:
-      coord = PawnToCoord(pawn)
-      expected = CoordToPawn(coord - self_off + other_off, pawn.black)
-
-      if expected not in other.pawns:
-        return False
-
-    return True
+    return self._TranslationKey() == other._TranslationKey()
 
   def __hash__(self) -> int:
-    self_off_x = min((pawn.x for pawn in self.pawns))
-    self_off_y = min((pawn.y for pawn in self.pawns))
-
-    def pawn_key(pawn: Pawn) -> int:
-      return (pawn.x - self_off_x) + (pawn.y - self_off_y) * self.num_pawns
-
     return hash((
-      tuple((pawn.x - self_off_x, pawn.y - self_off_y, pawn.black) for pawn in sorted(self.pawns, key=pawn_key)),
+      self._TranslationKey(),
       self.black_turn,
       self.num_pawns,
     ))
 
+  def _TranslationKey(self) -> Tuple[int, int, int]:
+    """Returns (width, black, white), where black and white are bitboards of
+    the pawns translated so the min x/min y corner is bit 0, with rows width
+    bits apart. Two boards have equal keys iff they are translations of each
+    other. Cached until the board next changes.
+    """
+    if self._key is None:
+      if not self._coords:
+        self._key = (0, 0, 0)
+      else:
+        minx, miny, maxx, _ = self._Bounds()
+        self._key = _translation_key(self._coords, self._blacks, minx, miny, maxx)
+    return self._key
+
+  def Key(self) -> Tuple[bool, int, int, int]:
+    """Returns (black_turn, width, black, white), which is equal for two games
+    with the same num_pawns iff they are ==."""
+    return (self.black_turn,) + self._TranslationKey()
+
+  def SymmetryKey(self) -> Tuple[bool, int, int, int]:
+    """Returns (black_turn, width, black, white), the smallest translation key
+    over all 12 rotations/reflections of the board, and over inverted colors
+    once all pawns are placed. Two games with the same num_pawns have equal
+    keys iff they are symmetries of each other.
+    """
+    if not self._coords:
+      return (self.black_turn, 0, 0, 0)
+
+    coords = self._coords
+    keys = []
+    for _ in range(2):
+      for _ in range(6):
+        minx = min((x for x, _ in coords))
+        maxx = max((x for x, _ in coords))
+        miny = min((y for _, y in coords))
+        keys.append(_translation_key(coords, self._blacks, minx, miny, maxx))
+        coords = [(x - y, x) for x, y in coords]
+      coords = [(x - y, -y) for x, y in coords]
+
+    width, black_bb, white_bb = min(keys)
+    key = (self.black_turn, width, black_bb, white_bb)
+    if len(self._coords) == self.num_pawns:
+      width, black_bb, white_bb = min(((w, wb, bb) for w, bb, wb in keys))
+      key = min(key, (not self.black_turn, width, black_bb, white_bb))
+    return key
+
   def __deepcopy__(self, memo) -> Onoro:
-    return Onoro(self.num_pawns, copy.deepcopy(self.pawns), self.black_turn)
+    # Everything but the pawn lists is an immutable int/tuple, so the copy can
+    # share it instead of rebuilding the bitboards and counts.
+    other = Onoro.__new__(Onoro)
+    other.num_pawns = self.num_pawns
+    other.black_turn = self.black_turn
+    other._pawns = None if self._pawns is None else self._pawns[:]
+    other._coords = self._coords[:]
+    other._blacks = self._blacks[:]
+    other._bounds = self._bounds
+    other._key = self._key
+    other._ox = self._ox
+    other._oy = self._oy
+    other._stride = self._stride
+    other.black_bb = self.black_bb
+    other.white_bb = self.white_bb
+    other._nbr_counts = self._nbr_counts
+    other._black_won = self._black_won
+    other._white_won = self._white_won
+    memo[id(self)] = other
+    return other
 
   def PawnAt(self, coord: Coord) -> int:
     """Returns the color of the pawn at coord, or EMPTY if no pawn is there."""
-    pawns_at = [pawn for pawn in self.pawns if (pawn.x, pawn.y) == coord]
-    if not pawns_at:
+    x, y = coord
+    if not (0 <= x - self._ox < self._stride and y >= self._oy):
       return self._EMPTY
-    if len(pawns_at) == 1:
-      return self._BLACK if pawns_at[0].black else self._WHITE
-    raise RuntimeError('Multiple pawns at position (%d, %d)' % (coord.x, coord.y))
+
+    bit = self._Bit(x, y)
+    if self.black_bb & bit:
+      assert not (self.white_bb & bit), 'Multiple pawns at position (%d, %d)' % coord
+      return self._BLACK
+    if self.white_bb & bit:
+      return self._WHITE
+    return self._EMPTY
 
   def HasWinner(self, check_errors: bool = True) -> bool:
     """Checks if a player has won, only returning true if it is not the winning player's turn."""
-    for pawn in self.pawns:
-      color = self._BLACK if pawn.black else self._WHITE
-      pawn_pos = Coord(pawn.x, pawn.y)
-
-      # Check for a win in all 3 possible directions
-      for delta in ((1, 0), (1, 1), (0, 1)):
-        n_in_row = 1
-
-        pos = pawn_pos + delta
-        while self.PawnAt(pos) == color:
-          n_in_row += 1
-          pos += delta
-
-        pos = pawn_pos - delta
-        while self.PawnAt(pos) == color:
-          n_in_row += 1
-          pos -= delta
-
-        if n_in_row >= self._N_IN_ROW_TO_WIN:
-          if check_errors and pawn.black == self.black_turn:
-            raise RuntimeError('Cannot have current player winning')
-          return True
-
-    return False
-
-  def PlayableSpots(self, pawns: Set[Coord]) -> Iterable[Coord]:
-    counts = dict()
-    for pawn in pawns:
-      for coord in coord_neighbors(pawn):
-        if coord in pawns:
-          continue
-        if coord not in counts:
-          counts[coord] = 0
-        counts[coord] += 1
-    return (loc for loc, count in counts.items() if count >= 2)
-
-  def _RemoveAdjacent(self, pawn: Coord, pawns: Set[Coord]) -> Set[Coord]:
-    for neighbor in coord_neighbors(pawn):
-      if neighbor in pawns:
-        pawns = pawns - {neighbor}
-        pawns = self._RemoveAdjacent(neighbor, pawns)
-    return pawns
-
-  def Connected(self, pawns: Set[Coord]) -> bool:
-    if not pawns:
-      return True
-    pawns = copy.copy(pawns)
-    pawn = pawns.pop()
-    return not self._RemoveAdjacent(pawn, pawns)
-
-  def TwoNeighborsEach(self, pawns: Set[Coord]) -> bool:
-    minx = min((pawn.x for pawn in pawns))
-    miny = min((pawn.y for pawn in pawns))
-
-    for pawn in pawns:
-      n_neighbors = len([neighbor for neighbor in coord_neighbors(pawn) if neighbor in pawns])
-      if n_neighbors < 2:
-        return False
-    return True
-
-  def P1Moves(self) -> Iterable[Pawn]:
-    if len(self.pawns) >= self.num_pawns:
-      raise RuntimeError('Not phase 1, %d pawns in play' % (len(self.num_pawns)))
-
-    coords = {PawnToCoord(pawn) for pawn in self.pawns}
-    return (CoordToPawn(coord, self.black_turn) for coord in self.PlayableSpots(coords))
-
-  def MakeP1Move(self, move: Pawn) -> None:
-    self.pawns += [move,]
+    if self.black_turn:
+      current_won, other_won = self._black_won, self._white_won
+    else:
+      current_won, other_won = self._white_won, self._black_won
+
+    if current_won and check_errors:
+      raise RuntimeError('Cannot have current player winning')
+    return current_won or other_won
+
+  def _CoordAt(self, bit: int) -> Coord:
+    """Returns the coordinate of the cell represented by the single bit set in bit."""
+    idx = bit.bit_length() - 1
+    return (self._ox + idx % self._stride, self._oy + idx // self._stride)
+
+  def _CoordsOf(self, bb: int) -> List[Coord]:
+    """Returns the coordinates of every cell set in bb."""
+    coords = []
+    while bb:
+      bit = bb & -bb
+      bb ^= bit
+      coords.append(self._CoordAt(bit))
+    return coords
+
+  def P1Moves(self) -> List[PawnT]:
+    if len(self._coords) >= self.num_pawns:
+      raise RuntimeError('Not phase 1, %d pawns in play' % len(self._coords))
+
+    _, s1, s2 = self._nbr_counts
+    spots = (s1 | s2) & ~(self.black_bb | self.white_bb)
+    return [CoordToPawn(coord, self.black_turn) for coord in self._CoordsOf(spots)]
+
+  def MakeP1Move(self, move: Union[Pawn, PawnT]) -> None:
+    self._pawns = None
+    self._key = None
+    self._coords.append((move.x, move.y))
+    self._blacks.append(move.black)
+    if self._bounds is not None:
+      minx, miny, maxx, maxy = self._bounds
+      self._bounds = (min(minx, move.x), min(miny, move.y), max(maxx, move.x), max(maxy, move.y))
+    self._AddToBitboards(move)
     self.black_turn = not self.black_turn
 
-  def P2Moves(self) -> Iterable[Tuple[Pawn, Pawn]]:
-    if len(self.pawns) != self.num_pawns:
-      raise RuntimeError('Not phase 2, %d pawns in play' % (len(self.num_pawns)))
+  def P2Moves(self) -> List[Tuple[PawnT, PawnT]]:
+    if len(self._coords) != self.num_pawns:
+      raise RuntimeError('Not phase 2, %d pawns in play' % len(self._coords))
 
-    pawns = {PawnToCoord(pawn) for pawn in self.pawns}
-    for pawn in self.pawns:
-      if pawn.black != self.black_turn:
+    pawns = self.pawns
+    moves = []
+    stride = self._stride
+    occ = self.black_bb | self.white_bb
+    for i, ((x, y), black) in enumerate(zip(self._coords, self._blacks)):
+      if black != self.black_turn:
         continue
 
-      pawn_coord = PawnToCoord(pawn)
-      assert(pawn_coord in pawns)
-      rem_pawns = pawns - {pawn_coord}
-      for coord in self.PlayableSpots(rem_pawns):
-        if coord == pawn_coord:
-          continue
+      pawn_bit = self._Bit(x, y)
+      assert(occ & pawn_bit)
+      rem_pawns = occ & ~pawn_bit
+      # Lifting the pawn only changes the counts of its 6 neighbors.
+      s0, s1, s2 = remove_neighbor(self._nbr_counts, cell_neighbors(pawn_bit, stride))
+      has_two_neighbors = s1 | s2
+      has_neighbor = s0 | has_two_neighbors
+
+      # Pawns left with fewer than two neighbors must all be adjacent to the
+      # moved pawn's destination. If any has none, no destination can fix it.
+      weak = rem_pawns & ~has_two_neighbors
+      if weak & ~has_neighbor:
+        continue
+
+      # The board stays connected if the destination touches every group of
+      # remaining pawns. Unless the pawn's neighbors are split around it there
+      # is only one, which every destination touches.
+      if splits_neighbors(pawn_bit, occ, stride):
+        groups = components(rem_pawns, stride)
+      else:
+        groups = ()
 
-        assert(coord not in rem_pawns)
-        new_pawns = rem_pawns | {coord}
-        if self.Connected(new_pawns) and self.TwoNeighborsEach(new_pawns):
-          yield (pawn, CoordToPawn(coord, pawn.black))
+      spots = has_two_neighbors & ~occ
+      while spots:
+        spot = spots & -spots
+        spots ^= spot
 
-  def MakeP2Move(self, move: Tuple[Pawn, Pawn]) -> None:
-    self.pawns.remove(move[0])
-    self.pawns += (move[1],)
+        around = cell_neighbors(spot, stride)
+        if weak & ~around:
+          continue
+        if all(group & around for group in groups):
+          moves.append((pawns[i], CoordToPawn(self._CoordAt(spot), black)))
+
+    return moves
+
+  def MakeP2Move(self, move: Tuple[PawnT, PawnT]) -> None:
+    i = self._coords.index((move[0].x, move[0].y))
+    del self._coords[i], self._blacks[i]
+    self._pawns = None
+    self._key = None
+    self._bounds = None
+    self._coords.append((move[1].x, move[1].y))
+    self._blacks.append(move[1].black)
+    self._RemoveFromBitboards(move[0])
+    self._AddToBitboards(move[1])
     self.black_turn = not self.black_turn
 
-  def Moves(self) -> Union[Iterable[Pawn], Iterable[Tuple[Pawn, Pawn]]]:
-    if len(self.pawns) == self.num_pawns:
+  def Moves(self) -> Union[List[PawnT], List[Tuple[PawnT, PawnT]]]:
+    if len(self._coords) == self.num_pawns:
       return self.P2Moves()
     else:
       return self.P1Moves()
 
-  def MakeMove(self, move: Union[Pawn, Tuple[Pawn, Pawn]]) -> None:
-    if len(self.pawns) == self.num_pawns:
-      assert(isinstance(move, Tuple))
+  def MakeMove(self, move: Union[Pawn, PawnT, Tuple[PawnT, PawnT]]) -> None:
+    if len(self._coords) == self.num_pawns:
+      assert(isinstance(move, tuple) and not isinstance(move, PawnT))
       self.MakeP2Move(move)
     else:
-      assert(isinstance(move, Pawn))
+      assert(isinstance(move, (Pawn, PawnT)))
       self.MakeP1Move(move)
 
 
@@ -376,9 +526,11 @@ def deserialize(gs: GameState, num_pawns: int, check_errors: bool = True) -> Ono
                        ('black' if not gs.black_turn else 'white', gs.turn_num))
   game = Onoro(num_pawns, gs.pawns, gs.black_turn)
 
-  if check_errors and gs.finished != game.HasWinner(check_errors=check_errors):
-    raise RuntimeError('Game state reports %s, but game has %s'
-                       % ('winner' if gs.finished else 'no winner',
-                          'a winner' if game.HasWinner() else 'no winner'))
+  if check_errors:
+    has_winner = game.HasWinner(check_errors=check_errors)
+    if gs.finished != has_winner:
+      raise RuntimeError('Game state reports %s, but game has %s'
+                         % ('winner' if gs.finished else 'no winner',
+                            'a winner' if has_winner else 'no winner'))
 
   return game
@@ -0,0 +1,165 @@
+
+# Kernels over bitboards: Python ints with one bit per cell of a hex grid, where
+# cell (x, y) is bit x + y * stride. Callers must keep pawns off the first and
+# last column of each row, so shifting a board by one cell never wraps a pawn
+# onto another row, and off the first row, so every pawn's neighbors have
+# non-negative bit indices.
+
+from __future__ import annotations
+import functools
+from typing import Iterable, List, Tuple
+
+
+def has_n_in_row(bb: int, shift: int, n: int) -> bool:
+  """Returns true if bb has n set bits in a row, each shift bits apart."""
+  run = bb
+  length = 1
+  while 2 * length <= n:
+    run &= run >> (length * shift)
+    length *= 2
+  if length < n:
+    run &= run >> ((n - length) * shift)
+  return run != 0
+
+
+def any_n_in_row(bb: int, stride: int, n: int) -> bool:
+  """Returns true if bb has n cells in a row along any of the 3 hex axes."""
+  # The axes (1, 0), (1, 1) and (0, 1)
+  for shift in (1, stride + 1, stride):
+    if has_n_in_row(bb, shift, n):
+      return True
+  return False
+
+
+def n_in_row_through(bb: int, bit: int, stride: int, n: int) -> bool:
+  """Returns true if bb has n cells in a row through the cell in bit, which must
+  be set in bb."""
+  for shift in (1, stride + 1, stride):
+    length = 1
+    b = bit << shift
+    while bb & b:
+      length += 1
+      b <<= shift
+    b = bit >> shift
+    while bb & b:
+      length += 1
+      b >>= shift
+    if length >= n:
+      return True
+  return False
+
+
+def _shifted_neighbors(bb: int, stride: int) -> Iterable[int]:
+  """Yields bb shifted onto each of the 6 neighbors of every cell."""
+  for shift in (1, stride + 1, stride):
+    yield bb << shift
+    yield bb >> shift
+
+
+def expand(bb: int, stride: int) -> int:
+  """Returns the cells adjacent to any cell in bb."""
+  return ((bb << 1) | (bb >> 1) |
+          (bb << (stride + 1)) | (bb >> (stride + 1)) |
+          (bb << stride) | (bb >> stride))
+
+
+@functools.lru_cache(maxsize=None)
+def _neighbor_mask(stride: int) -> int:
+  """Returns the neighbors of cell stride + 1, the first cell whose neighbors
+  all have non-negative indices."""
+  return expand(1 << (stride + 1), stride)
+
+
+def cell_neighbors(bit: int, stride: int) -> int:
+  """Returns the neighbors of the single cell in bit.
+
+  Equivalent to expand(bit, stride), but shifts a precomputed neighbor mask
+  into place instead of combining six shifted copies.
+  """
+  shift = bit.bit_length() - stride - 2
+  mask = _neighbor_mask(stride)
+  return mask << shift if shift >= 0 else mask >> -shift
+
+
+# The number of runs of set bits in each 6-bit mask, read cyclically.
+_RING_RUNS = tuple(bin(m & ~((m << 1 | m >> 5) & 0x3f)).count('1') for m in range(64))
+
+
+def neighbor_ring(bit: int, occ: int, stride: int) -> int:
+  """Returns a 6-bit mask of which neighbors of the single cell in bit are in
+  occ, in order around the cell. The cell must not be in the first row or the
+  first/last column."""
+  i = bit.bit_length() - 1
+  return (((occ >> (i + 1)) & 1) |
+          ((occ >> (i + stride + 1)) & 1) << 1 |
+          ((occ >> (i + stride)) & 1) << 2 |
+          ((occ >> (i - 1)) & 1) << 3 |
+          ((occ >> (i - stride - 1)) & 1) << 4 |
+          ((occ >> (i - stride)) & 1) << 5)
+
+
+def splits_neighbors(bit: int, occ: int, stride: int) -> bool:
+  """Returns whether the neighbors in occ of the cell in bit form more than one
+  run around it. Consecutive neighbors are adjacent to each other, so if they
+  don't, removing the cell can't disconnect occ. The cell must not be in the
+  first row or the first/last column."""
+  return _RING_RUNS[neighbor_ring(bit, occ, stride)] > 1
+
+
+# The number of neighbors of every cell, as a bit-sliced counter: the ones,
+# twos and fours bits of each cell's count are its bits in the three boards.
+NeighborCounts = Tuple[int, int, int]
+
+
+def count_neighbors(occ: int, stride: int) -> NeighborCounts:
+  """Counts the neighbors in occ of every cell."""
+  s0 = s1 = s2 = 0
+  for n in _shifted_neighbors(occ, stride):
+    c0 = s0 & n
+    s0 ^= n
+    c1 = s1 & c0
+    s1 ^= c0
+    s2 ^= c1
+  return (s0, s1, s2)
+
+
+def add_neighbor(counts: NeighborCounts, cells: int) -> NeighborCounts:
+  """Increments the neighbor counts of every cell in cells."""
+  s0, s1, s2 = counts
+  c0 = s0 & cells
+  s0 ^= cells
+  c1 = s1 & c0
+  s1 ^= c0
+  s2 ^= c1
+  return (s0, s1, s2)
+
+
+def remove_neighbor(counts: NeighborCounts, cells: int) -> NeighborCounts:
+  """Decrements the neighbor counts of every cell in cells."""
+  s0, s1, s2 = counts
+  b0 = cells & ~s0
+  s0 ^= cells
+  b1 = b0 & ~s1
+  s1 ^= b0
+  s2 ^= b1
+  return (s0, s1, s2)
+
+
+def flood_fill(seed: int, occ: int, stride: int) -> int:
+  """Returns the cells of occ connected to seed."""
+  visited = 0
+  frontier = seed
+  while frontier:
+    visited |= frontier
+    frontier = expand(frontier, stride) & occ & ~visited
+  return visited
+
+
+def components(occ: int, stride: int) -> List[int]:
+  """Splits the pawns in occ into connected groups."""
+  components = []
+  while occ:
+    component = flood_fill(occ & -occ, occ, stride)
+    components.append(component)
+    occ &= ~component
+  return components
@@ -1,12 +1,13 @@
 
 import copy
 import random
-from typing import Iterable, Set
+from typing import Dict, Iterable, List, Tuple
 
 from onoro import Onoro, deserialize
 from game_state_pb2 import GameState, GameStates
 
 import test_symmetries_cc
+from next_states_cc import gen_next_states_cc
 
 Pawn = GameState.Pawn
 
@@ -59,48 +60,51 @@ def are_symm_cc(g1: Onoro, g2: Onoro) -> bool:
   return test_symmetries_cc.are_symmetries(gs_bytes)
 
 
-def insert_symm(cache: Set[Onoro], game: Onoro, do_print=False) -> bool:
-  for g in each_symm(game):
-    if g in cache:
-      if do_print:
-        if not color_invert and not reflected and orientation == 0:
-          print('found exact game')
-        else:
-          if reflected:
-            r_str = 's' + str(orientation)
-          else:
-            r_str = 'r' + str(orientation)
-          print('found game upon ' + r_str + \
-              (' color inverted' if color_invert else ''))
-        print(g)
+# Maps the SymmetryKey of each game seen so far to a random symmetry of it.
+SymmCache = Dict[Tuple[bool, int, int, int], Onoro]
+
+
+# Inserts a random symmetry of game into cache and games, unless some symmetry
+# of it is already there.
+def insert_symm(cache: SymmCache, games: List[Onoro], game: Onoro, do_print=False) -> bool:
+  key = game.SymmetryKey()
+  if key in cache:
+    if do_print:
+      print('found symmetric game')
+      print(game)
 
-      for g2 in each_symm(game):
-        res1 = are_symm_cc(game, g2)
-        res2 = are_symm_cc(g2, game)
+    for g2 in each_symm(game):
+      res1 = are_symm_cc(game, g2)
+      res2 = are_symm_cc(g2, game)
 
-        if res1 is None or res2 is None:
-          print(game)
-          print(g2)
-          assert(False)
+      if res1 is None or res2 is None:
+        print(game)
+        print(g2)
+        assert(False)
 
-        assert(res1)
-        assert(res2)
-      return False
+      assert(res1)
+      assert(res2)
+    return False
 
   g_copy = copy.deepcopy(game)
   apply_random_symm_ops(g_copy)
-  cache.add(g_copy)
+  cache[key] = g_copy
+  games.append(g_copy)
   return True
 
 
 def test_random_moves(game: Onoro, max_moves: int, do_print=False) -> bool:
-  cache = set()
-  cache.add(game)
+  # The walk keeps expanding games drawn from the cache, so over half of the
+  # states it generates moves for have been seen before.
+  next_states_cache = {}
+  cache = {game.SymmetryKey(): game}
+  # The cached games, in a list so one can be sampled without copying them
+  # out of the dict each turn.
+  games = [game]
 
   for i in range(max_moves):
     while True:
-      prev = random.choice(tuple(cache))
-      g = copy.deepcopy(prev)
+      g = random.choice(games)
       if i % 500 == 0:
         print('turn', i)
         print(g)
@@ -109,13 +113,15 @@ def test_random_moves(game: Onoro, max_moves: int, do_print=False) -> bool:
         continue
       else:
         break
-    move = random.choice(tuple(g.Moves()))
-    g.MakeMove(move)
+    # Let the C++ move generator enumerate the next states in one call, and
+    # only deserialize the one picked.
+    next_states = gen_next_states_cc(g.serialize().SerializeToString(), next_states_cache)
+    g = deserialize(random.choice(next_states.state), g.num_pawns)
 
-    if not insert_symm(cache, g) and do_print:
+    if not insert_symm(cache, games, g) and do_print:
       print(g)
 
-  cache_list = list(cache)
+  cache_list = games[:]
 
   for t in range(10):
     print('trial', t)
@@ -1,16 +1,26 @@
 
 import copy
 import ctypes
+import multiprocessing
+import os
 import random
 import subprocess
-from typing import Iterable
+from typing import Iterable, Optional
 
+from google.protobuf.internal import api_implementation
 from onoro import Onoro, deserialize
-from game_state_pb2 import GameState, GameStates
-import test_next_moves_cc
+from game_state_pb2 import GameState
+from next_states_cc import gen_next_states_cc
 
 Pawn = GameState.Pawn
 
+# These tests serialize and parse a game state per move, which the pure python
+# protobuf backend is an order of magnitude slower at. Fail loudly instead of
+# silently running that slowly.
+if api_implementation.Type() not in ('cpp', 'upb'):
+  raise RuntimeError('protobuf is using the %s backend, expected cpp or upb'
+                     % api_implementation.Type())
+
 
 def gen_starting_game(n_pawns: int) -> Onoro:
   pawns = (
@@ -23,42 +33,37 @@ def gen_starting_game(n_pawns: int) -> Onoro:
 
 # Prints the echo command that can be used in shell
 def print_echo_cmd(game: Onoro) -> None:
-  state_bytes = bytes(game.serialize().SerializeToString())
+  state_bytes = game.serialize().SerializeToString()
   proto_in = len(state_bytes).to_bytes(4, byteorder='big') + state_bytes
 
-  s = 'echo -n -e "'
-  for byte in proto_in:
-    s += '\\x%02x' % int(byte)
-
-  s += '"'
-  print(s)
+  print('echo -n -e "' + ''.join('\\x%02x' % byte for byte in proto_in) + '"')
 
 
 def run_cc(game: Onoro) -> None:
-  proc = subprocess.Popen(['./test_next_moves'], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+  # Only the diagnostics on stderr are shown, so stdout is discarded rather than
+  # piped back.
+  proc = subprocess.Popen(['./test_next_moves'], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
 
-  state_bytes = bytes(game.serialize().SerializeToString())
+  state_bytes = game.serialize().SerializeToString()
   proto_in = len(state_bytes).to_bytes(4, byteorder='big') + state_bytes
-  proc.stdin.write(proto_in)
-  proc.stdin.flush()
 
-  proc.wait(timeout=1)
-  print(proc.stderr.read().decode('utf-8'))
+  # communicate drains stderr while waiting, so a chatty child can't fill the
+  # pipe and block before exiting.
+  _, err = proc.communicate(proto_in, timeout=1)
+  print(err.decode('utf-8'))
   print('returned', proc.returncode)
 
 
-def get_next_moves_cc(game: Onoro) -> Iterable[Onoro]:
-  state_bytes = bytes(game.serialize().SerializeToString())
-  res = test_next_moves_cc.gen_next_moves(state_bytes)
-
-  gs = GameStates()
-  gs.ParseFromString(res)
+def get_next_moves_cc(game: Onoro, state_bytes: Optional[bytes] = None) -> Iterable[Onoro]:
+  if state_bytes is None:
+    state_bytes = game.serialize().SerializeToString()
+  gs = gen_next_states_cc(state_bytes)
 
   for g in gs.state:
     try:
       yield deserialize(g, game.num_pawns)
     except RuntimeError as e:
-      print(game.serialize().SerializeToString())
+      print(state_bytes)
       print(game)
       print(deserialize(g, game.num_pawns, check_errors=False).__repr__(check_errors=False))
       raise e
@@ -70,19 +75,26 @@ def get_next_moves_py(game: Onoro) -> Iterable[Onoro]:
     yield g
 
 
-def test_next_moves(game: Onoro) -> bool:
-  s_cc = set()
-  s_py = set()
-  for g in get_next_moves_cc(game):
-    assert(g not in s_cc)
-    s_cc.add(g)
+def test_next_moves(game: Onoro, verbose: bool = True) -> bool:
+  # Next states from each side, keyed by Onoro.Key() so the comparison below
+  # hashes plain int tuples.
+  cc_games = {}
+  py_games = {}
+  state_bytes = game.serialize().SerializeToString()
+  for g in get_next_moves_cc(game, state_bytes):
+    key = g.Key()
+    assert(key not in cc_games)
+    cc_games[key] = g
   for g in get_next_moves_py(game):
-    assert(g not in s_py)
-    s_py.add(g)
+    key = g.Key()
+    assert(key not in py_games)
+    py_games[key] = g
 
-  cc_only = s_cc - s_py
-  py_only = s_py - s_cc
+  cc_only = [cc_games[key] for key in cc_games.keys() - py_games.keys()]
+  py_only = [py_games[key] for key in py_games.keys() - cc_games.keys()]
 
+  if not verbose:
+    return len(cc_only) + len(py_only) == 0
   if len(cc_only) + len(py_only) != 0:
     print(game)
 
@@ -105,45 +117,67 @@ def test_next_moves(game: Onoro) -> bool:
       print(g.__repr__(diff=game))
 
     # print('all python moves:')
-    # for g in sorted(s_py, key=sort_token):
+    # for g in sorted(py_games.values(), key=sort_token):
     #   print(g.__repr__(diff=game))
     res = False
 
   return res
 
 
-def test_random_moves(game: Onoro, max_moves: int) -> bool:
+def test_random_moves(game: Onoro, max_moves: int, verbose: bool = True) -> bool:
   prev = None
   for i in range(max_moves):
-    if prev is not None:
-      print(game.__repr__(diff=prev))
-    else:
-      print(game)
-    prev = copy.deepcopy(game)
+    if verbose:
+      if prev is not None:
+        print(game.__repr__(diff=prev))
+      else:
+        print(game)
+      prev = copy.deepcopy(game)
 
     if game.HasWinner():
-      print('someone won after %d moves!' % i)
+      if verbose:
+        print('someone won after %d moves!' % i)
       break
-    if not test_next_moves(game):
-      print('Failed after', i, 'moves')
+    if not test_next_moves(game, verbose=verbose):
+      if verbose:
+        print('Failed after', i, 'moves')
       return False
-    move = random.choice(list(game.Moves()))
+    move = random.choice(game.Moves())
     game.MakeMove(move)
 
   return True
 
 
-def main():
-  random.seed(2)
-  num_pawns = 16
-  game = gen_starting_game(num_pawns)
+NUM_PAWNS = 16
+MAX_MOVES = 500
+
+
+def run_seed(seed: int, verbose: bool = False) -> bool:
+  random.seed(seed)
+  game = gen_starting_game(NUM_PAWNS)
 
   # gstr = b''
   # gs = GameState()
   # gs.ParseFromString(gstr)
-  # game = deserialize(gs, num_pawns)
+  # game = deserialize(gs, NUM_PAWNS)
+
+  return test_random_moves(game, MAX_MOVES, verbose=verbose)
 
-  print(test_random_moves(game, 500))
+
+def main():
+  # Each seed is an independent random walk, so run one per core.
+  seeds = range(2, 2 + (os.cpu_count() or 1))
+  with multiprocessing.Pool() as pool:
+    results = pool.map(run_seed, seeds)
+
+  # Replay failing walks in this process, printing every board, so the output
+  # isn't interleaved with the other workers'.
+  for seed, res in zip(seeds, results):
+    if not res:
+      print('seed %d failed:' % seed)
+      run_seed(seed, verbose=True)
+
+  print(all(results))
 
 
 if __name__ == '__main__':